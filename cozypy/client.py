@@ -5,12 +5,14 @@ import requests
 from cozypy.constant import USER_AGENT, COZYTOUCH_ENDPOINT, DeviceCommand
 from cozypy.exception import CozytouchException
 from cozypy.handlers import SetupHandler
+from cozypy.objects import CozytouchActionGroup
 
 
 class CozytouchClient:
 
-    def __init__(self, username, password, timeout=60, max_retry=3):
+    def __init__(self, username, password, timeout=60, max_retry=3, endpoint=COZYTOUCH_ENDPOINT):
         self.session = requests.Session()
+        self.endpoint = endpoint
         self.retry = 0
         self.max_retry = max_retry
         self.username = username
@@ -24,7 +26,7 @@ class CozytouchClient:
         headers = {'User-Agent': USER_AGENT}
         payload = {'userId': self.username,'userPassword': self.password}
         response = self.session.post(
-            COZYTOUCH_ENDPOINT + "login",
+            self.endpoint + "login",
             headers=headers,
             data=payload,
             timeout=self.timeout
@@ -33,30 +35,41 @@ class CozytouchClient:
         if response.status_code != 200:
             raise CozytouchException("Authentication failed")
 
-    def __retry(self, response, callback, *kwargs):
-        if response.status_code == 401 and self.retry < self.max_retry:
-            self.retry += 1
+    def __retry(self, response, callback, *args):
+        """ Authenticate again and replay callback on 401, returns (retried, result) """
+        if response.status_code != 401 or self.retry >= self.max_retry:
+            self.retry = 0
+            return False, None
+
+        self.retry += 1
+        try:
             self.__authenticate()
-            callback(kwargs)
-        else:
+            return True, callback(*args)
+        finally:
             self.retry = 0
 
     def get_setup(self, *args):
         """ Get cozytouch setup (devices, places) """
+        return SetupHandler(self.get_setup_data(), self)
+
+    def get_setup_data(self, *args):
+        """ Get raw cozytouch setup json """
 
         headers = {'User-Agent': USER_AGENT}
         response = self.session.get(
-            COZYTOUCH_ENDPOINT + '/getSetup',
+            self.endpoint + '/getSetup',
             headers=headers,
             timeout=self.timeout
         )
 
-        self.__retry(response, self.get_setup)
+        retried, result = self.__retry(response, self.get_setup_data)
+        if retried:
+            return result
 
         if response.status_code != 200:
             raise CozytouchException("Unable to retrieve setup %s " % response.content)
 
-        return SetupHandler(response.json(), self)
+        return response.json()
 
     def get_states(self, devices: list, *args):
         """ Get devices states """
@@ -69,13 +82,15 @@ class CozytouchClient:
             for device in devices
         ]
         response = self.session.post(
-            COZYTOUCH_ENDPOINT + '/getStates',
+            self.endpoint + '/getStates',
             headers=headers,
             data=json.dumps(payload),
             timeout=self.timeout
         )
 
-        self.__retry(response, self.get_states, *args)
+        retried, result = self.__retry(response, self.get_states, devices)
+        if retried:
+            return result
 
         if response.status_code != 200:
             raise CozytouchException("Unable to retrieve devices states %s" % response.content)
@@ -83,8 +98,7 @@ class CozytouchClient:
         return response.json()
 
     def send_command(self, label, device, command:DeviceCommand, parameters = None, *args):
-        """ Get devices states """
-        headers = {'User-Agent': USER_AGENT, 'Content-type': 'application/json'}
+        """ Send a command to a device """
         payload = {
             "label": label,
             "actions": [
@@ -96,18 +110,132 @@ class CozytouchClient:
                 }
             ]
         }
+        json_response = self.apply(payload, *args)
+        print(json_response)
+        return json_response
+
+    def apply(self, payload: dict, *args):
+        """ Apply raw actions (label, actions) """
+        headers = {'User-Agent': USER_AGENT, 'Content-type': 'application/json'}
         response = self.session.post(
-            COZYTOUCH_ENDPOINT + '/apply',
+            self.endpoint + '/apply',
             headers=headers,
             data=json.dumps(payload),
             timeout=self.timeout
         )
 
-        self.__retry(response, self.send_command, *args)
+        retried, result = self.__retry(response, self.apply, payload)
+        if retried:
+            return result
 
         if response.status_code != 200:
             raise CozytouchException("Unable to send command %s" % response.content)
 
-        json_response = response.json()
-        print(json_response)
-        return json_response
\ No newline at end of file
+        return response.json()
+
+    def get_action_groups(self, *args):
+        """ Get action groups (scenarios) """
+        headers = {'User-Agent': USER_AGENT}
+        response = self.session.get(
+            self.endpoint + '/actionGroups',
+            headers=headers,
+            timeout=self.timeout
+        )
+
+        retried, result = self.__retry(response, self.get_action_groups)
+        if retried:
+            return result
+
+        if response.status_code != 200:
+            raise CozytouchException("Unable to retrieve action groups %s" % response.content)
+
+        action_groups = []
+        for data in response.json():
+            action_group = CozytouchActionGroup(data)
+            action_group.client = self
+            action_groups.append(action_group)
+        return action_groups
+
+    def create_action_group(self, action_group:CozytouchActionGroup, *args):
+        """ Create an action group """
+        headers = {'User-Agent': USER_AGENT, 'Content-type': 'application/json'}
+        payload = {"label": action_group.name, "actions": action_group.actions}
+        response = self.session.put(
+            self.endpoint + '/actionGroups',
+            headers=headers,
+            data=json.dumps(payload),
+            timeout=self.timeout
+        )
+
+        retried, result = self.__retry(response, self.create_action_group, action_group)
+        if retried:
+            return result
+
+        if response.status_code != 200:
+            raise CozytouchException("Unable to create action group %s" % response.content)
+
+        action_group.data["oid"] = response.json()["id"]
+        action_group.client = self
+        return action_group
+
+    def update_action_group(self, action_group:CozytouchActionGroup, *args):
+        """ Update an action group """
+        if not action_group.is_saved:
+            raise CozytouchException("Action group not saved")
+        headers = {'User-Agent': USER_AGENT, 'Content-type': 'application/json'}
+        payload = {"label": action_group.name, "actions": action_group.actions}
+        response = self.session.post(
+            self.endpoint + '/actionGroups/' + action_group.id,
+            headers=headers,
+            data=json.dumps(payload),
+            timeout=self.timeout
+        )
+
+        retried, result = self.__retry(response, self.update_action_group, action_group)
+        if retried:
+            return result
+
+        if response.status_code != 200:
+            raise CozytouchException("Unable to update action group %s" % response.content)
+
+        return action_group
+
+    def delete_action_group(self, action_group:CozytouchActionGroup, *args):
+        """ Delete an action group """
+        if not action_group.is_saved:
+            raise CozytouchException("Action group not saved")
+        headers = {'User-Agent': USER_AGENT}
+        response = self.session.delete(
+            self.endpoint + '/actionGroups/' + action_group.id,
+            headers=headers,
+            timeout=self.timeout
+        )
+
+        retried, result = self.__retry(response, self.delete_action_group, action_group)
+        if retried:
+            return result
+
+        if response.status_code != 200:
+            raise CozytouchException("Unable to delete action group %s" % response.content)
+
+        return action_group
+
+    def execute_action_group(self, action_group:CozytouchActionGroup, *args):
+        """ Execute an action group, the server fans out commands to devices """
+        if not action_group.is_saved:
+            raise CozytouchException("Action group not saved")
+        headers = {'User-Agent': USER_AGENT}
+        response = self.session.post(
+            self.endpoint + '/exec/' + action_group.id,
+            headers=headers,
+            timeout=self.timeout
+        )
+
+        retried, result = self.__retry(response, self.execute_action_group, action_group)
+        if retried:
+            return result
+
+        if response.status_code != 200:
+            raise CozytouchException("Unable to execute action group %s" % response.content)
+
+        return response.json()
@@ -22,6 +22,16 @@ class DeviceStateType(enum.Enum):
     LIST = 10
 
 
+class DeviceStateValue(str, enum.Enum):
+    """ Base of the enums built from the values of discrete state definitions """
+
+    def __str__(self):
+        return self.value
+
+    def __format__(self, format_spec):
+        return format(self.value, format_spec)
+
+
 class DeviceState(enum.Enum):
     AWAY_STATE = 'core:HolidaysModeState'
     OPERATING_MODE_STATE = 'io:TargetHeatingLevelState'
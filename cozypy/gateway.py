@@ -0,0 +1,390 @@
+import hmac
+import json
+import logging
+import queue
+import secrets
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import requests
+
+from cozypy.client import CozytouchClient
+from cozypy.exception import CozytouchException
+from cozypy.objects import CozytouchActionGroup, CozytouchDevice
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = "JSESSIONID"
+
+
+class _SingleFlight:
+    """ Merge concurrent calls sharing the same key into a single execution """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, callback):
+        with self.lock:
+            future = self.calls.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.calls[key] = future
+
+        if owner:
+            try:
+                future.set_result(callback())
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    del self.calls[key]
+
+        return future.result()
+
+
+class CozytouchGateway:
+    """ Local caching gateway sharing one upstream session between many consumers
+
+    Consumers point their client to the gateway address:
+    CozytouchClient(username, password, endpoint="http://127.0.0.1:8765/")
+    """
+
+    def __init__(self, client: CozytouchClient, host="127.0.0.1", port=8765, setup_ttl=3600, states_ttl=60,
+                 command_timeout=120):
+        self.client = client
+        self.setup_ttl = setup_ttl
+        self.states_ttl = states_ttl
+        self.command_timeout = command_timeout
+        self.sessions = set()
+        self.setup = None
+        self.setup_time = None
+        self.states = {}
+        self.lock = threading.Lock()
+        self.upstream_lock = threading.Lock()
+        self.flight = _SingleFlight()
+        self.commands = queue.Queue()
+        self.server = ThreadingHTTPServer((host, port), _GatewayRequestHandler)
+        self.server.daemon_threads = True
+        self.server.gateway = self
+        self.threads = []
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        """ Start the command worker and serve requests in background threads """
+        self.threads = [
+            threading.Thread(target=self.__process_commands, daemon=True),
+            threading.Thread(target=self.server.serve_forever, daemon=True)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        if self.threads:
+            self.server.shutdown()
+            self.commands.put(None)
+            for thread in self.threads:
+                thread.join()
+            self.threads = []
+        self.server.server_close()
+
+    def login(self, username, password):
+        """ Check consumer credentials against the upstream account, returns a session id """
+        if username is None or password is None:
+            return None
+        if not (hmac.compare_digest(username.encode(), self.client.username.encode())
+                and hmac.compare_digest(password.encode(), self.client.password.encode())):
+            return None
+        session = secrets.token_hex(16)
+        with self.lock:
+            self.sessions.add(session)
+        return session
+
+    def is_authenticated(self, session):
+        with self.lock:
+            return session in self.sessions
+
+    def get_setup(self):
+        """ Get setup json, devices states are served from the states cache """
+        with self.lock:
+            if self.setup_time is not None and time.monotonic() - self.setup_time < self.setup_ttl:
+                setup = self.setup
+            else:
+                setup = None
+        if setup is None:
+            setup = self.flight.do("setup", self.__refresh_setup)
+
+        devices = [device for device in setup["setup"]["devices"] if device.get("states")]
+        states = self.get_states([
+            {"deviceURL": device["deviceURL"], "states": [{"name": state["name"]} for state in device["states"]]}
+            for device in devices
+        ])
+        states = {device["deviceURL"]: device["states"] for device in states}
+        return dict(setup, setup=dict(setup["setup"], devices=[
+            dict(device, states=states[device["deviceURL"]]) if device.get("states") else device
+            for device in setup["setup"]["devices"]
+        ]))
+
+    def get_states(self, request: list):
+        """ Get devices states, only stale ones are fetched from upstream """
+        now = time.monotonic()
+        stale = {}
+        with self.lock:
+            for device in request:
+                url = device["deviceURL"]
+                cached = self.states.get(url, {})
+                names = [state["name"] for state in device.get("states", [])] or list(cached)
+                if not names or any(
+                        name not in cached or now - cached[name][0] >= self.states_ttl for name in names):
+                    stale[url] = sorted(set(names))
+
+        if stale:
+            key = json.dumps(sorted(stale.items()))
+            self.flight.do(key, lambda: self.__refresh_states(stale))
+
+        devices = []
+        with self.lock:
+            for device in request:
+                url = device["deviceURL"]
+                cached = self.states.get(url, {})
+                names = [state["name"] for state in device.get("states", [])] or list(cached)
+                devices.append({
+                    "deviceURL": url,
+                    "states": [cached[name][1] for name in names if name in cached]
+                })
+        return devices
+
+    def apply(self, payload: dict):
+        """ Queue actions, commands are forwarded upstream one at a time """
+        self.__check_actions(payload)
+        return self.__queue(lambda: self.client.apply(payload), lambda: self.__invalidate(payload))
+
+    def get_action_groups(self):
+        """ Get action groups, concurrent reads are merged into one upstream call """
+        def fetch():
+            with self.upstream_lock:
+                return [action_group.data for action_group in self.client.get_action_groups()]
+        return self.flight.do("actionGroups", fetch)
+
+    def create_action_group(self, payload: dict):
+        self.__check_actions(payload)
+        action_group = CozytouchActionGroup(payload)
+        self.__queue(lambda: self.client.create_action_group(action_group))
+        return {"id": action_group.id}
+
+    def update_action_group(self, oid, payload: dict):
+        self.__check_actions(payload)
+        action_group = CozytouchActionGroup(dict(payload, oid=oid))
+        self.__queue(lambda: self.client.update_action_group(action_group))
+        return {}
+
+    def delete_action_group(self, oid):
+        action_group = CozytouchActionGroup({"oid": oid})
+        self.__queue(lambda: self.client.delete_action_group(action_group))
+        return {}
+
+    def execute_action_group(self, oid):
+        """ Queue an action group execution, its devices are unknown so every cached state is dropped """
+        action_group = CozytouchActionGroup({"oid": oid})
+        return self.__queue(lambda: self.client.execute_action_group(action_group), self.__invalidate_all)
+
+    @staticmethod
+    def __check_actions(payload):
+        if not isinstance(payload, dict) or not isinstance(payload.get("actions"), list):
+            raise ValueError("Invalid actions payload")
+        for action in payload["actions"]:
+            if not isinstance(action, dict) or not isinstance(action.get("deviceURL"), str) \
+                    or not isinstance(action.get("commands"), list):
+                raise ValueError("Invalid action %s" % action)
+
+    def __queue(self, callback, invalidate=None):
+        future = Future()
+        self.commands.put((callback, invalidate, future))
+        try:
+            return future.result(timeout=self.command_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise CozytouchException("Command timed out")
+
+    def __refresh_setup(self):
+        with self.upstream_lock:
+            setup = self.client.get_setup_data()
+        now = time.monotonic()
+        with self.lock:
+            self.setup = setup
+            self.setup_time = now
+            for device in setup["setup"]["devices"]:
+                self.__store_states(device["deviceURL"], device.get("states", []), now)
+        return setup
+
+    def __refresh_states(self, stale: dict):
+        devices = [
+            CozytouchDevice({"deviceURL": url, "states": [{"name": name} for name in names]})
+            for url, names in stale.items()
+        ]
+        with self.upstream_lock:
+            response = self.client.get_states(devices)
+        now = time.monotonic()
+        with self.lock:
+            for device in response["devices"]:
+                self.__store_states(device["deviceURL"], device["states"], now)
+
+    def __store_states(self, url, states, timestamp):
+        cached = self.states.setdefault(url, {})
+        for state in states:
+            cached[state["name"]] = (timestamp, state)
+
+    def __process_commands(self):
+        while True:
+            item = self.commands.get()
+            if item is None:
+                break
+            callback, invalidate, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with self.upstream_lock:
+                    result = callback()
+            except Exception as e:
+                if invalidate is not None:
+                    invalidate()
+                future.set_exception(e)
+            else:
+                if invalidate is not None:
+                    invalidate()
+                future.set_result(result)
+
+    def __invalidate(self, payload):
+        """ Drop cached states of commanded devices """
+        with self.lock:
+            try:
+                for action in payload.get("actions", []):
+                    self.states.pop(action.get("deviceURL"), None)
+            except (AttributeError, TypeError):
+                logger.warning("Unable to invalidate states for %s", payload)
+
+    def __invalidate_all(self):
+        with self.lock:
+            self.states.clear()
+
+
+class _GatewayRequestHandler(BaseHTTPRequestHandler):
+
+    @property
+    def segments(self):
+        return [segment for segment in self.path.split("?")[0].split("/") if segment]
+
+    @property
+    def route(self):
+        segments = self.segments
+        return segments[-1] if segments else ""
+
+    @property
+    def action_group_id(self):
+        """ Action group oid of /actionGroups/<oid> and /exec/<oid> paths """
+        segments = self.segments
+        if len(segments) >= 2 and segments[-2] in ("actionGroups", "exec"):
+            return segments[-2], segments[-1]
+        return None, None
+
+    @property
+    def session(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+
+    def do_GET(self):
+        if self.route == "getSetup":
+            self.__reply(lambda gateway, body: gateway.get_setup())
+        elif self.route == "actionGroups":
+            self.__reply(lambda gateway, body: gateway.get_action_groups())
+        else:
+            self.__send(404, {"error": "Unknown path %s" % self.path})
+
+    def do_PUT(self):
+        if self.route == "actionGroups":
+            self.__reply(lambda gateway, body: gateway.create_action_group(json.loads(body)))
+        else:
+            self.__send(404, {"error": "Unknown path %s" % self.path})
+
+    def do_DELETE(self):
+        collection, oid = self.action_group_id
+        if collection == "actionGroups":
+            self.__reply(lambda gateway, body: gateway.delete_action_group(oid))
+        else:
+            self.__send(404, {"error": "Unknown path %s" % self.path})
+
+    def do_POST(self):
+        collection, oid = self.action_group_id
+        if collection == "exec" and oid != "apply":
+            self.__reply(lambda gateway, body: gateway.execute_action_group(oid))
+        elif collection == "actionGroups":
+            self.__reply(lambda gateway, body: gateway.update_action_group(oid, json.loads(body)))
+        elif self.route == "login":
+            self.__login()
+        elif self.route == "getStates":
+            self.__reply(lambda gateway, body: {"devices": gateway.get_states(json.loads(body))})
+        elif self.route == "apply":
+            self.__reply(lambda gateway, body: gateway.apply(json.loads(body)))
+        else:
+            self.__send(404, {"error": "Unknown path %s" % self.path})
+
+    def __read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length < 0:
+            raise ValueError("Invalid Content-Length %s" % length)
+        return self.rfile.read(length) if length else b""
+
+    def __login(self):
+        try:
+            credentials = parse_qs(self.__read_body().decode())
+        except ValueError as e:
+            self.close_connection = True
+            self.__send(400, {"error": str(e)})
+            return
+        session = self.server.gateway.login(
+            credentials.get("userId", [None])[0],
+            credentials.get("userPassword", [None])[0]
+        )
+        if session is None:
+            self.__send(401, {"error": "Authentication failed"})
+        else:
+            self.__send(200, {"success": True}, {"Set-Cookie": "%s=%s; HttpOnly" % (SESSION_COOKIE, session)})
+
+    def __reply(self, callback):
+        gateway = self.server.gateway
+        try:
+            body = self.__read_body()
+        except ValueError as e:
+            self.close_connection = True
+            self.__send(400, {"error": str(e)})
+            return
+        if not gateway.is_authenticated(self.session):
+            self.__send(401, {"error": "Not authenticated"})
+            return
+        try:
+            self.__send(200, callback(gateway, body))
+        except (CozytouchException, requests.RequestException) as e:
+            self.__send(502, {"error": str(e)})
+        except (ValueError, KeyError, TypeError) as e:
+            self.__send(400, {"error": str(e)})
+
+    def __send(self, status, content, headers=None):
+        data = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
@@ -1,4 +1,3 @@
-from cozypy.constant import DeviceType
 from cozypy.exception import CozytouchException
 from cozypy.objects import CozytouchDevice, CozytouchPlace, CozytouchHeater
 
@@ -23,7 +22,7 @@ class SetupHandler:
         sensors = []
         heaters = []
         for device in devices:
-            if device["widget"] in [DeviceType.HEATER.value, DeviceType.HEATER_PASV.value]:
+            if issubclass(CozytouchDevice.device_class(device), CozytouchHeater):
                 heaters.append(device)
             else:
                 sensors.append(device)
@@ -39,10 +38,8 @@ class SetupHandler:
                 raise CozytouchException("Place %s not found" % heater["placeOID"])
             heater_url = extract_id(heater["deviceURL"])
             heater_sensors = [CozytouchDevice.build(sensor, self.client, place) for sensor in sensors if extract_id(sensor["deviceURL"]) == heater_url]
-            heater = CozytouchHeater(heater)
+            heater = CozytouchDevice.build(heater, self.client, place)
             heater.sensors = heater_sensors
-            heater.place = place
-            heater.client = self.client
             self.heaters.append(heater)
 
     def __find_place(self, oid):
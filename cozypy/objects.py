@@ -1,6 +1,8 @@
+import json
+import re
 import time
 
-from cozypy.constant import DeviceType, DeviceState, DeviceCommand
+from cozypy.constant import DeviceType, DeviceState, DeviceStateType, DeviceStateValue, DeviceCommand
 from cozypy.exception import CozytouchException
 
 
@@ -27,38 +29,134 @@ class CozytouchObject:
         return self.data["lastUpdateTime"]
 
 
+def decode_int(value):
+    """ Decode whole numbers only, fractional values are kept as they are """
+    if isinstance(value, float) and not value.is_integer():
+        return value
+    return int(value)
+
+
+def decode_str(value):
+    """ Decode scalars only, str() would turn containers into their repr """
+    if isinstance(value, (dict, list)):
+        return value
+    return str(value)
+
+
+def json_decoder(expected:type):
+    """ Keep values of the expected type and parse json strings, anything else is kept raw """
+    def decode(value):
+        if isinstance(value, str):
+            decoded = json.loads(value)
+            if isinstance(decoded, expected):
+                return decoded
+        return value
+    return decode
+
+
+STATE_DECODERS = {
+    DeviceStateType.INT.value: decode_int,
+    DeviceStateType.FLOAT.value: float,
+    DeviceStateType.STR.value: decode_str,
+    DeviceStateType.DICT.value: json_decoder(dict),
+    DeviceStateType.LIST.value: json_decoder(list),
+}
+
+
+STATE_ENUMS = {}
+
+
+def state_enum_members(values:list):
+    """ Upper case identifiers for enum members, so they never shadow str or Enum attributes """
+    members = {}
+    for value in dict.fromkeys(values):
+        name = re.sub(r"\W", "_", value).upper()
+        if not name[:1].isalpha():
+            name = "V_" + name
+        while name in members:
+            name += "_"
+        members[name] = value
+    return list(members.items())
+
+
+def state_enum(definition:dict):
+    """ Get the enum of a discrete state definition values, built once per definition """
+    values = definition.get("values")
+    if not values or not all(isinstance(v, str) and v for v in values):
+        return None
+    key = (definition.get("qualifiedName"), tuple(values))
+    if key not in STATE_ENUMS:
+        name = str(definition.get("qualifiedName")).split(":")[-1]
+        try:
+            STATE_ENUMS[key] = DeviceStateValue(name, state_enum_members(values))
+        except (ValueError, TypeError):
+            STATE_ENUMS[key] = None
+    return STATE_ENUMS[key]
+
+
+def decode_state(state:dict, state_enum=None):
+    """ Decode a raw state value using the decoder of its DeviceStateType and definition enum """
+    value = state.get("value")
+    decoder = STATE_DECODERS.get(state.get("type"))
+    if value is None or decoder is None:
+        return value
+    try:
+        value = decoder(value)
+    except (TypeError, ValueError):
+        return value
+    if state_enum is not None and isinstance(value, str):
+        try:
+            return state_enum(value)
+        except ValueError:
+            return value
+    return value
+
+
 class CozytouchDevice(CozytouchObject):
 
+    widget_classes = {}
+    controllable_classes = {}
+
     def __init__(self, data:dict):
         super(CozytouchDevice, self).__init__(data)
+        self.__definitions = {
+            definition["qualifiedName"]: definition
+            for definition in data.get("definition", {}).get("states", [])
+        }
+        self.__enums = {
+            name: state_enum(definition) for name, definition in self.__definitions.items()
+        }
         self.states = data["states"]
         self.place = None
+        try:
+            self.widget = DeviceType(data.get("widget"))
+        except ValueError:
+            self.widget = None
 
     @property
     def deviceUrl(self):
         return self.data["deviceURL"]
 
     @property
-    def widget(self):
-        return DeviceType(self.data['widget'])
+    def states(self):
+        return self.__states
+
+    @states.setter
+    def states(self, states:list):
+        self.__states = states
+        self.__state_index = {s["name"]: s for s in states}
+        self.__values = {s["name"]: decode_state(s, self.__enums.get(s["name"])) for s in states}
 
     def get_state_definition(self, state:DeviceState):
-        for definition in self.data["definition"]["states"]:
-            if definition["qualifiedName"] == state.value:
-                return definition
-        return None
+        return self.__definitions.get(state.value)
 
     def get_state(self, state:DeviceState, value_only=True):
-        for s in self.states:
-            if s["name"] == state.value:
-                return s["value"] if value_only else s
-        return None
+        if value_only:
+            return self.__values.get(state.value)
+        return self.__state_index.get(state.value)
 
     def has_state(self, state:DeviceState):
-        for s in self.states:
-            if s["name"] == state.value:
-                return True
-        return False
+        return state.value in self.__state_index
 
     def update(self):
         if self.client is None:
@@ -67,28 +165,39 @@ class CozytouchDevice(CozytouchObject):
         self.states = updated_data["devices"][0]["states"]
 
     @staticmethod
-    def build(data, client, place):
-        device = None
-        if data["widget"] == DeviceType.OCCUPANCY.value:
-            device = CozytouchOccupancySensor(data)
-        elif data["widget"] == DeviceType.TEMPERATURE.value:
-            device = CozytouchTemperatureSensor(data)
-        elif data["widget"] == DeviceType.ELECTRECITY.value:
-            device = CozytouchElectricitySensor(data)
-        elif data["widget"] == DeviceType.CONTACT.value:
-            device = CozytouchContactSensor(data)
-
-        if device is None:
-            raise CozytouchException("Unknown device %s" % data["widget"])
+    def register(*widgets, controllable_names=()):
+        """ Register a device class for widgets and controllable names """
+        def decorator(device_class):
+            for widget in widgets:
+                widget = widget.value if isinstance(widget, DeviceType) else widget
+                CozytouchDevice.widget_classes[widget] = device_class
+            for controllable_name in controllable_names:
+                CozytouchDevice.controllable_classes[controllable_name] = device_class
+            return device_class
+        return decorator
+
+    @staticmethod
+    def device_class(data):
+        """ Find the device class registered for device data, controllable name first """
+        device_class = CozytouchDevice.controllable_classes.get(data.get("controllableName"))
+        if device_class is None:
+            device_class = CozytouchDevice.widget_classes.get(data.get("widget"), CozytouchDevice)
+        return device_class
 
+    @staticmethod
+    def build(data, client, place):
+        device = CozytouchDevice.device_class(data)(data)
         device.client = client
         device.place = place
         return device
 
+
+@CozytouchDevice.register(DeviceType.CONTACT)
 class CozytouchContactSensor(CozytouchDevice):
     pass
 
 
+@CozytouchDevice.register(DeviceType.ELECTRECITY)
 class CozytouchElectricitySensor(CozytouchDevice):
 
     @property
@@ -96,6 +205,7 @@ class CozytouchElectricitySensor(CozytouchDevice):
         return self.get_state(DeviceState.ELECTRIC_ENERGY_CONSUMTION_STATE)
 
 
+@CozytouchDevice.register(DeviceType.TEMPERATURE)
 class CozytouchTemperatureSensor(CozytouchDevice):
 
     @property
@@ -103,6 +213,7 @@ class CozytouchTemperatureSensor(CozytouchDevice):
         return self.get_state(DeviceState.TEMPERATURE_STATE)
 
 
+@CozytouchDevice.register(DeviceType.OCCUPANCY)
 class CozytouchOccupancySensor(CozytouchDevice):
 
     @property
@@ -115,6 +226,7 @@ class CozytouchOccupancySensor(CozytouchDevice):
         return False
 
 
+@CozytouchDevice.register(DeviceType.HEATER, DeviceType.HEATER_PASV)
 class CozytouchHeater(CozytouchDevice):
 
     def __init__(self, data:dict):
@@ -226,8 +338,48 @@ class CozytouchHeater(CozytouchDevice):
             sensor.update()
         super(CozytouchHeater, self).update()
 
+
 class CozytouchPlace(CozytouchObject):
 
     def __init__(self, data):
         super(CozytouchPlace, self).__init__(data)
 
+
+class CozytouchActionGroup(CozytouchObject):
+
+    def __init__(self, data:dict):
+        super(CozytouchActionGroup, self).__init__(data)
+        self.data.setdefault("actions", [])
+
+    @property
+    def actions(self):
+        return self.data["actions"]
+
+    @property
+    def is_saved(self):
+        return "oid" in self.data
+
+    def add_command(self, device:CozytouchDevice, command:DeviceCommand, parameters = None):
+        for action in self.actions:
+            if action["deviceURL"] == device.deviceUrl:
+                break
+        else:
+            action = {"deviceURL": device.deviceUrl, "commands": []}
+            self.actions.append(action)
+        action["commands"].append({"name": command.value, "parameters": parameters})
+        return self
+
+    def save(self):
+        if self.client is None:
+            raise CozytouchException("Unable to save action group")
+        if self.is_saved:
+            self.client.update_action_group(self)
+        else:
+            self.client.create_action_group(self)
+
+    def execute(self):
+        if not self.is_saved:
+            raise CozytouchException("Action group not saved")
+        if self.client is None:
+            raise CozytouchException("Unable to execute action group")
+        return self.client.execute_action_group(self)
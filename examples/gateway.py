@@ -0,0 +1,31 @@
+import os
+import logging
+import time
+
+from cozypy.client import CozytouchClient
+from cozypy.exception import CozytouchException
+from cozypy.gateway import CozytouchGateway
+
+logger = logging.getLogger("cozytouch.examples")
+
+
+clientId = os.environ['COZYTOUTCH_CLIENT_ID']
+clientPassword = os.environ['COZYTOUTCH_CLIENT_PASSWORD']
+
+try:
+    gateway = CozytouchGateway(CozytouchClient(clientId, clientPassword))
+    gateway.start()
+    host, port = gateway.address
+    print("Gateway listening on http://%s:%s/" % (host, port))
+
+    # Consumers share the gateway session instead of logging in upstream
+    consumer = CozytouchClient(clientId, clientPassword, endpoint="http://%s:%s/" % (host, port))
+    setup = consumer.get_setup()
+    for heater in setup.heaters:
+        print("\t", heater.name, heater.operation_mode)
+
+    while True:
+        time.sleep(60)
+
+except CozytouchException as e:
+    logger.exception(e)
@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest import mock
 from unittest.mock import patch
@@ -5,6 +6,9 @@ from unittest.mock import patch
 from requests import Session
 
 from cozypy.client import CozytouchClient
+from cozypy.constant import DeviceCommand
+from cozypy.exception import CozytouchException
+from cozypy.objects import CozytouchActionGroup, CozytouchHeater
 
 
 def mock_response(status, content, json_data = False):
@@ -178,6 +182,111 @@ class TestClient(unittest.TestCase):
                 self.assertEqual(len(setup.places), 1)
                 self.assertEqual(len(setup.heaters), 3)
 
+    def test_retry_after_unauthorized(self):
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.return_value = mock_response(200, {})
+            client = CozytouchClient("test", "test")
+
+        payload = {"label": "l", "actions": []}
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.side_effect = [
+                mock_response(401, b"expired"),
+                mock_response(200, {}),
+                mock_response(200, {"execId": "1"}, True)
+            ]
+            self.assertEqual(client.apply(payload), {"execId": "1"})
+            self.assertEqual(mock_post.call_count, 3)
+            self.assertTrue(mock_post.call_args_list[1][0][0].endswith("login"))
+            self.assertEqual(json.loads(mock_post.call_args_list[2][1]["data"]), payload)
+
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.side_effect = [mock_response(401, b"expired"), mock_response(200, {})] * 4
+            with self.assertRaises(CozytouchException):
+                client.apply(payload)
+            self.assertEqual(mock_post.call_count, 7)
+
+    def test_action_group(self):
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.return_value = mock_response(200, {})
+            client = CozytouchClient("test", "test")
+
+        heater = CozytouchHeater(setup_response["setup"]["devices"][2])
+        action_group = CozytouchActionGroup({"label": "Night"})
+        action_group.add_command(heater, DeviceCommand.SET_OPERATION_MODE, ["eco"])
+        action_group.add_command(heater, DeviceCommand.SET_ECO_TEMP, [3])
+        self.assertEqual(action_group.actions, [{
+            "deviceURL": heater.deviceUrl,
+            "commands": [
+                {"name": "setHeatingLevel", "parameters": ["eco"]},
+                {"name": "setEcoTemperature", "parameters": [3]}
+            ]
+        }])
+
+        payload = {"label": "Night", "actions": action_group.actions}
+        action_group.client = client
+        with patch.object(Session, 'put') as mock_put:
+            mock_put.return_value = mock_response(200, {"id": "group-oid"}, True)
+            action_group.save()
+            self.assertEqual(action_group.id, "group-oid")
+            self.assertTrue(mock_put.call_args[0][0].endswith("/actionGroups"))
+            self.assertEqual(json.loads(mock_put.call_args[1]["data"]), payload)
+
+        action_group.data["label"] = "Late night"
+        payload["label"] = "Late night"
+        with patch.object(Session, 'put') as mock_put, patch.object(Session, 'post') as mock_post:
+            mock_post.return_value = mock_response(200, {}, True)
+            action_group.save()
+            mock_put.assert_not_called()
+            self.assertTrue(mock_post.call_args[0][0].endswith("/actionGroups/group-oid"))
+            self.assertEqual(json.loads(mock_post.call_args[1]["data"]), payload)
+
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.return_value = mock_response(200, {"execId": "exec-id"}, True)
+            self.assertEqual(action_group.execute(), {"execId": "exec-id"})
+            self.assertTrue(mock_post.call_args[0][0].endswith("/exec/group-oid"))
+            self.assertNotIn("data", mock_post.call_args[1])
+
+        with patch.object(Session, 'get') as mock_get:
+            mock_get.return_value = mock_response(200, [action_group.data], True)
+            action_groups = client.get_action_groups()
+            self.assertEqual(len(action_groups), 1)
+            self.assertEqual(action_groups[0].name, "Late night")
+            self.assertEqual(action_groups[0].actions, action_group.actions)
+            self.assertTrue(mock_get.call_args[0][0].endswith("/actionGroups"))
+
+        with patch.object(Session, 'delete') as mock_delete:
+            mock_delete.return_value = mock_response(200, b"")
+            client.delete_action_group(action_group)
+            self.assertTrue(mock_delete.call_args[0][0].endswith("/actionGroups/group-oid"))
+
+    def test_action_group_not_saved(self):
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.return_value = mock_response(200, {})
+            client = CozytouchClient("test", "test")
+
+        action_group = CozytouchActionGroup({"label": "Night"})
+        action_group.client = client
+        with self.assertRaisesRegex(CozytouchException, "not saved"):
+            action_group.execute()
+        for method in (client.update_action_group, client.delete_action_group, client.execute_action_group):
+            with self.assertRaisesRegex(CozytouchException, "not saved"):
+                method(action_group)
+
+    def test_action_group_retry_after_unauthorized(self):
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.return_value = mock_response(200, {})
+            client = CozytouchClient("test", "test")
+
+        action_group = CozytouchActionGroup({"label": "Night", "oid": "group-oid"})
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.side_effect = [
+                mock_response(401, b"expired"),
+                mock_response(200, {}),
+                mock_response(200, {"execId": "exec-id"}, True)
+            ]
+            self.assertEqual(client.execute_action_group(action_group), {"execId": "exec-id"})
+            self.assertTrue(mock_post.call_args_list[1][0][0].endswith("login"))
+            self.assertTrue(mock_post.call_args_list[2][0][0].endswith("/exec/group-oid"))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,236 @@
+import http.client
+import http.cookiejar
+import json
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.parse
+import urllib.request
+from unittest.mock import patch
+
+import requests
+from requests import Session
+
+from cozypy.client import CozytouchClient
+from cozypy.constant import DeviceCommand
+from cozypy.gateway import CozytouchGateway
+from cozypy.objects import CozytouchActionGroup, CozytouchHeater
+from tests.test_client import mock_response, setup_response
+
+TEMPERATURE_URL = "io://0832-9894-4518/10071767#2"
+HEATER_URL = "io://0812-9894-4518/10071767#1"
+
+
+class TestGateway(unittest.TestCase):
+
+    def setUp(self):
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.return_value = mock_response(200, {})
+            self.client = CozytouchClient("test", "test")
+        self.gateway = CozytouchGateway(self.client, port=0)
+        self.gateway.start()
+        host, port = self.gateway.address
+        self.url = "http://%s:%s/" % (host, port)
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.login("test", "test")
+
+    def tearDown(self):
+        self.gateway.stop()
+
+    def login(self, username, password):
+        data = urllib.parse.urlencode({"userId": username, "userPassword": password}).encode()
+        with self.opener.open(self.url + "login", data=data) as response:
+            return json.loads(response.read())
+
+    def request(self, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        with self.opener.open(self.url + path, data=data) as response:
+            return json.loads(response.read())
+
+    def assertStatus(self, status, path, payload=None):
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.request(path, payload)
+        self.assertEqual(context.exception.code, status)
+        context.exception.close()
+
+    def test_authentication(self):
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.login("test", "wrong")
+        self.assertEqual(context.exception.code, 401)
+        context.exception.close()
+
+        self.opener = urllib.request.build_opener()
+        self.assertStatus(401, "getSetup")
+
+    def test_setup_cached(self):
+        with patch.object(Session, 'get') as mock_get:
+            mock_get.return_value = mock_response(200, setup_response, True)
+            first = self.request("getSetup")
+            self.assertEqual(self.request("getSetup"), first)
+            self.assertEqual(mock_get.call_count, 1)
+
+        self.assertEqual(first["setup"]["rootPlace"], setup_response["setup"]["rootPlace"])
+        self.assertEqual([device["label"] for device in first["setup"]["devices"]],
+                         [device["label"] for device in setup_response["setup"]["devices"]])
+
+    def test_states_served_from_setup(self):
+        with patch.object(Session, 'get') as mock_get, patch.object(Session, 'post') as mock_post:
+            mock_get.return_value = mock_response(200, setup_response, True)
+            self.request("getSetup")
+            states = self.request("getStates", [
+                {"deviceURL": TEMPERATURE_URL, "states": [{"name": "core:TemperatureState"}]}
+            ])
+            self.assertEqual(states["devices"][0]["states"][0]["value"], 20)
+            mock_post.assert_not_called()
+
+    def test_concurrent_states_merged(self):
+        release = threading.Event()
+        called = threading.Event()
+        upstream = {"devices": [{"deviceURL": HEATER_URL, "states": [
+            {"name": "core:OnOffState", "type": 3, "value": "on"}
+        ]}]}
+
+        def slow_post(*args, **kwargs):
+            called.set()
+            release.wait(5)
+            return mock_response(200, upstream, True)
+
+        results = []
+        payload = [{"deviceURL": HEATER_URL, "states": [{"name": "core:OnOffState"}]}]
+        with patch.object(Session, 'post', side_effect=slow_post) as mock_post:
+            threads = [threading.Thread(target=lambda: results.append(self.request("getStates", payload)))
+                       for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            self.assertTrue(called.wait(5))
+            release.set()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(mock_post.call_count, 1)
+
+        self.assertEqual(len(results), 5)
+        for result in results:
+            self.assertEqual(result, upstream)
+
+    def test_apply_forwarded(self):
+        payload = {"label": "test", "actions": [
+            {"deviceURL": HEATER_URL, "commands": [{"name": "setHeatingLevel", "parameters": ["eco"]}]}
+        ]}
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.return_value = mock_response(200, {"execId": "1"}, True)
+            self.assertEqual(self.request("apply", payload), {"execId": "1"})
+            self.assertEqual(json.loads(mock_post.call_args[1]["data"]), payload)
+
+    def test_setup_serves_fresh_states(self):
+        upstream = {"devices": [{"deviceURL": TEMPERATURE_URL, "states": [
+            {"name": "core:StatusState", "type": 3, "value": "available"},
+            {"name": "core:TemperatureState", "type": 2, "value": 21}
+        ]}]}
+        with patch.object(Session, 'get') as mock_get, patch.object(Session, 'post') as mock_post:
+            mock_get.return_value = mock_response(200, setup_response, True)
+            mock_post.return_value = mock_response(200, upstream, True)
+            self.request("getSetup")
+            self.gateway.states[TEMPERATURE_URL]["core:TemperatureState"] = (time.monotonic() - 3600, {})
+            setup = self.request("getSetup")
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertEqual(mock_post.call_count, 1)
+
+        self.assertEqual(setup["setup"]["devices"][0]["states"][1]["value"], 21)
+
+    def test_apply_invalidates_setup_states(self):
+        payload = {"label": "test", "actions": [
+            {"deviceURL": HEATER_URL, "commands": [{"name": "setHeatingLevel", "parameters": ["eco"]}]}
+        ]}
+        upstream = {"devices": [{"deviceURL": HEATER_URL, "states": [
+            {"name": "core:ComfortRoomTemperatureState", "type": 1, "value": 20},
+            {"name": "core:EcoRoomTemperatureState", "type": 1, "value": 2},
+            {"name": "core:OnOffState", "type": 3, "value": "on"},
+            {"name": "io:TargetHeatingLevelState", "type": 3, "value": "eco"}
+        ]}]}
+        with patch.object(Session, 'get') as mock_get, patch.object(Session, 'post') as mock_post:
+            mock_get.return_value = mock_response(200, setup_response, True)
+            mock_post.return_value = mock_response(200, {"execId": "1"}, True)
+            self.request("getSetup")
+            self.request("apply", payload)
+            mock_post.return_value = mock_response(200, upstream, True)
+            setup = self.request("getSetup")
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertTrue(mock_post.call_args[0][0].endswith("/getStates"))
+
+        heater = setup["setup"]["devices"][2]
+        self.assertEqual(heater["states"], upstream["devices"][0]["states"][:3])
+
+    def test_action_groups(self):
+        consumer = CozytouchClient("test", "test", endpoint=self.url)
+        heater = CozytouchHeater(setup_response["setup"]["devices"][2])
+        action_group = CozytouchActionGroup({"label": "Night"})
+        action_group.add_command(heater, DeviceCommand.SET_OPERATION_MODE, ["eco"])
+        action_group.client = consumer
+        self.gateway.states[HEATER_URL] = {}
+
+        upstream = self.client.session
+        with patch.object(upstream, 'put') as mock_put, patch.object(upstream, 'post') as mock_post, \
+                patch.object(upstream, 'get') as mock_get, patch.object(upstream, 'delete') as mock_delete:
+            mock_put.return_value = mock_response(200, {"id": "group-oid"}, True)
+            action_group.save()
+            self.assertEqual(action_group.id, "group-oid")
+            self.assertEqual(json.loads(mock_put.call_args[1]["data"]),
+                             {"label": "Night", "actions": action_group.actions})
+
+            mock_post.return_value = mock_response(200, {}, True)
+            action_group.save()
+            self.assertTrue(mock_post.call_args[0][0].endswith("/actionGroups/group-oid"))
+
+            mock_post.return_value = mock_response(200, {"execId": "exec-id"}, True)
+            self.assertEqual(action_group.execute(), {"execId": "exec-id"})
+            self.assertTrue(mock_post.call_args[0][0].endswith("/exec/group-oid"))
+            self.assertNotIn(HEATER_URL, self.gateway.states)
+
+            mock_get.return_value = mock_response(200, [action_group.data], True)
+            action_groups = consumer.get_action_groups()
+            self.assertEqual([group.id for group in action_groups], ["group-oid"])
+
+            mock_delete.return_value = mock_response(200, b"")
+            consumer.delete_action_group(action_group)
+            self.assertTrue(mock_delete.call_args[0][0].endswith("/actionGroups/group-oid"))
+
+    def test_invalid_content_length(self):
+        host, port = self.gateway.address
+        connection = http.client.HTTPConnection(host, port, timeout=5)
+        try:
+            connection.putrequest("POST", "/getStates")
+            connection.putheader("Content-Length", "abc")
+            connection.endheaders()
+            self.assertEqual(connection.getresponse().status, 400)
+        finally:
+            connection.close()
+
+    def test_stop_without_start(self):
+        gateway = CozytouchGateway(self.client, port=0)
+        thread = threading.Thread(target=gateway.stop, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_malformed_apply(self):
+        self.assertStatus(400, "apply", {"label": "x", "actions": [{"commands": []}]})
+        self.assertStatus(400, "apply", {"label": "x"})
+        self.assertStatus(400, "apply", ["x"])
+
+        payload = {"label": "test", "actions": [{"deviceURL": HEATER_URL, "commands": []}]}
+        with patch.object(Session, 'post') as mock_post:
+            mock_post.return_value = mock_response(200, {"execId": "1"}, True)
+            self.assertEqual(self.request("apply", payload), {"execId": "1"})
+
+    def test_upstream_errors(self):
+        with patch.object(Session, 'get', side_effect=requests.ConnectionError("down")):
+            self.assertStatus(502, "getSetup")
+
+        with patch.object(Session, 'get') as mock_get:
+            mock_get.return_value = mock_response(500, b"error")
+            self.assertStatus(502, "getSetup")
+
+
+if __name__ == '__main__':
+    unittest.main()
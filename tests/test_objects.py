@@ -0,0 +1,122 @@
+import json
+import unittest
+
+from cozypy.constant import DeviceType, DeviceState, DeviceStateValue
+from cozypy.objects import CozytouchDevice, CozytouchHeater, CozytouchTemperatureSensor, decode_state, \
+    state_enum
+from tests.test_client import setup_response
+
+
+class TestObjects(unittest.TestCase):
+
+    def test_build_from_registry(self):
+        sensor = CozytouchDevice.build(setup_response["setup"]["devices"][0], None, None)
+        self.assertIsInstance(sensor, CozytouchTemperatureSensor)
+        self.assertEqual(sensor.widget, DeviceType.TEMPERATURE)
+
+        heater = CozytouchDevice.build(setup_response["setup"]["devices"][2], None, None)
+        self.assertIsInstance(heater, CozytouchHeater)
+        self.assertEqual(heater.widget, DeviceType.HEATER)
+
+    def test_register_device(self):
+        data = {"deviceURL": "io://0812-9894-4518/10071769#1", "widget": "Pod", "states": []}
+        device = CozytouchDevice.build(data, None, None)
+        self.assertIs(type(device), CozytouchDevice)
+        self.assertEqual(device.widget, DeviceType.POD)
+
+        @CozytouchDevice.register(controllable_names=["internal:PodV2Component"])
+        class CozytouchPod(CozytouchDevice):
+            pass
+
+        try:
+            data["controllableName"] = "internal:PodV2Component"
+            pod = CozytouchDevice.build(data, None, None)
+            self.assertIsInstance(pod, CozytouchPod)
+            self.assertEqual(pod.widget, DeviceType.POD)
+        finally:
+            del CozytouchDevice.controllable_classes["internal:PodV2Component"]
+
+    def test_typed_states(self):
+        heater = CozytouchHeater({
+            "deviceURL": "io://0812-9894-4518/10071767#1",
+            "states": [
+                {'name': 'core:ComfortRoomTemperatureState', 'type': 1, 'value': "19"},
+                {'name': 'core:EcoRoomTemperatureState', 'type': 1, 'value': 2.5},
+                {'name': 'core:TemperatureState', 'type': 2, 'value': 20},
+                {'name': 'core:OnOffState', 'type': 3, 'value': 'on'},
+                {'name': 'core:HolidaysModeState', 'type': 3, 'value': None}
+            ]
+        })
+        self.assertEqual(heater.comfort_temperature, 19)
+        self.assertEqual(heater.get_state(DeviceState.ECO_TEMPERATURE_STATE), 2.5)
+        self.assertIsInstance(heater.get_state(DeviceState.TEMPERATURE_STATE), float)
+        self.assertEqual(heater.get_state(DeviceState.ON_OFF_STATE), "on")
+        self.assertIsNone(heater.get_state(DeviceState.AWAY_STATE))
+        self.assertTrue(heater.has_state(DeviceState.AWAY_STATE))
+        self.assertEqual(heater.get_state(DeviceState.ON_OFF_STATE, False)["type"], 3)
+
+        heater.states = [{'name': 'core:OnOffState', 'type': 3, 'value': 'off'}]
+        self.assertEqual(heater.get_state(DeviceState.ON_OFF_STATE), "off")
+        self.assertFalse(heater.has_state(DeviceState.COMFORT_TEMPERATURE_STATE))
+
+
+    def test_enum_states(self):
+        definition = {"states": [{
+            "qualifiedName": "io:TargetHeatingLevelState",
+            "type": "DiscreteState",
+            "values": ["off", "frostprotection", "eco", "comfort-2", "comfort-1", "comfort"]
+        }]}
+        heaters = [CozytouchHeater({
+            "deviceURL": "io://0812-9894-4518/1007176%s#1" % i,
+            "definition": definition,
+            "states": [{'name': 'io:TargetHeatingLevelState', 'type': 3, 'value': 'eco'}]
+        }) for i in range(2)]
+
+        mode = heaters[0].operation_mode
+        self.assertIsInstance(mode, DeviceStateValue)
+        self.assertIs(type(mode), type(heaters[1].operation_mode))
+        self.assertEqual(mode, "eco")
+        self.assertEqual("%s" % mode, "eco")
+        self.assertEqual(json.dumps(mode), '"eco"')
+
+        heaters[0].states = [{'name': 'io:TargetHeatingLevelState', 'type': 3, 'value': 'boost'}]
+        self.assertEqual(heaters[0].operation_mode, "boost")
+        self.assertNotIsInstance(heaters[0].operation_mode, DeviceStateValue)
+
+
+    def test_container_states(self):
+        self.assertEqual(decode_state({"type": 10, "value": "[1,2]"}), [1, 2])
+        self.assertEqual(decode_state({"type": 10, "value": [1, 2]}), [1, 2])
+        self.assertEqual(decode_state({"type": 10, "value": "abc"}), "abc")
+        self.assertEqual(decode_state({"type": 10, "value": '{"a": 1}'}), '{"a": 1}')
+        self.assertEqual(decode_state({"type": 11, "value": '{"a": 1}'}), {"a": 1})
+        self.assertEqual(decode_state({"type": 11, "value": {"a": 1}}), {"a": 1})
+        self.assertEqual(decode_state({"type": 11, "value": "[1,2]"}), "[1,2]")
+        self.assertEqual(decode_state({"type": 11, "value": 3}), 3)
+        self.assertEqual(decode_state({"type": 3, "value": {"a": 1}}), {"a": 1})
+        self.assertEqual(decode_state({"type": 3, "value": 3}), "3")
+
+    def test_enum_member_names(self):
+        values = ["mro", "lower", "count", "name", "comfort-1", "comfort_1", "-2°C", "_hidden"]
+        heater = CozytouchHeater({
+            "deviceURL": "io://0812-9894-4518/10071767#1",
+            "definition": {"states": [{"qualifiedName": "io:TargetHeatingLevelState", "values": values}]},
+            "states": [{'name': 'io:TargetHeatingLevelState', 'type': 3, 'value': 'lower'}]
+        })
+        mode = heater.operation_mode
+        self.assertIsInstance(mode, DeviceStateValue)
+        self.assertEqual(mode.lower(), "lower")
+        self.assertEqual(mode.count("o"), 1)
+        self.assertEqual(sorted(member.value for member in type(mode)), sorted(values))
+
+        for value in values:
+            heater.states = [{'name': 'io:TargetHeatingLevelState', 'type': 3, 'value': value}]
+            self.assertEqual(heater.operation_mode, value)
+            self.assertIsInstance(heater.operation_mode, DeviceStateValue)
+
+    def test_invalid_enum_definition(self):
+        self.assertIsNone(state_enum({"qualifiedName": "io:BrokenState", "values": ["a", 1]}))
+        self.assertIsNone(state_enum({"qualifiedName": "io:BrokenState", "values": []}))
+
+if __name__ == '__main__':
+    unittest.main()